@@ -4,7 +4,6 @@ Loads settings from environment variables with sensible defaults.
 """
 
 import os
-from pathlib import Path
 
 
 class Config:
@@ -57,14 +56,17 @@ class Config:
     
     # Discord Configuration (Optional)
     DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL', '')
-    DISCORD_ENABLED = bool(os.getenv('DISCORD_WEBHOOK_URL', ''))
+    DISCORD_ENABLED = bool(DISCORD_WEBHOOK_URL)
     
     # Plex Configuration
     PLEX_URL = os.getenv('PLEX_URL', 'http://localhost:32400')
     PLEX_TOKEN = os.getenv('PLEX_TOKEN', '')
     PLEX_MOVIES_LIBRARY = os.getenv('PLEX_MOVIES_LIBRARY', 'Movies')
     PLEX_TV_LIBRARY = os.getenv('PLEX_TV_LIBRARY', 'TV Shows')
-    PLEX_ENABLED = bool(os.getenv('PLEX_TOKEN', ''))
+    # Optional section IDs; when set, scans skip the library name lookup
+    PLEX_MOVIE_SECTION_ID = os.getenv('PLEX_MOVIE_SECTION_ID', '')
+    PLEX_TV_SECTION_ID = os.getenv('PLEX_TV_SECTION_ID', '')
+    PLEX_ENABLED = bool(PLEX_TOKEN)
     
     # Upload Settings
     MAX_CONTENT_LENGTH = None  # No file size limit by default
@@ -72,24 +74,26 @@ class Config:
     # App URL (for links in emails)
     APP_URL = os.getenv('APP_URL', 'http://localhost:8082')
     
+    # Set once validate() has succeeded; lowercase so from_object() skips it
+    _validated = False
+    
     @classmethod
     def validate(cls):
         """Validate required configuration."""
+        if cls._validated:
+            return []
+        
         errors = []
         
         # Check required paths exist or can be created
-        for path_name in ['PENDING_MOVIES_PATH', 'PENDING_TV_PATH']:
-            path = getattr(cls, path_name)
+        for path in (cls.PENDING_MOVIES_PATH, cls.PENDING_TV_PATH,
+                     cls.PLEX_MOVIES_PATH, cls.PLEX_TV_PATH,
+                     os.path.dirname(os.path.abspath(cls.DATABASE_PATH))):
             try:
-                Path(path).mkdir(parents=True, exist_ok=True)
+                os.makedirs(path, exist_ok=True)
             except Exception as e:
-                errors.append(f"Cannot create {path_name}: {e}")
-        
-        # Check database directory
-        db_dir = Path(cls.DATABASE_PATH).parent
-        try:
-            db_dir.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            errors.append(f"Cannot create database directory: {e}")
+                errors.append(f"Cannot create {path}: {e}")
         
+        if not errors:
+            cls._validated = True
         return errors
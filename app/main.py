@@ -4,24 +4,33 @@ Custom web application for friends to upload movies/TV shows to a Plex server.
 """
 
 import os
+import atexit
+import errno
+import fcntl
+import re
 import shutil
 import sqlite3
-import uuid
 import hashlib
+import hmac
+import json
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from functools import wraps
-from pathlib import Path
+from urllib.parse import unquote
 
+from markupsafe import Markup
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    flash, jsonify, send_from_directory, g, session
+    flash, jsonify, make_response, send_from_directory, g, session
 )
 from werkzeug.utils import secure_filename
 
 from config import Config
 from notifications import send_upload_notification, send_approval_notification, send_denial_notification
-from plex_integration import trigger_plex_scan
+from plex_integration import queue_plex_scan
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -30,29 +39,158 @@ app.secret_key = Config.SECRET_KEY if Config.SECRET_KEY != 'change-this-to-a-ran
 # Database setup
 DATABASE = Config.DATABASE_PATH
 
+# Config values read by every page render, bound once at import
+APP_NAME = Config.APP_NAME
+MOVIE_INSTRUCTIONS = Config.UPLOAD_INSTRUCTIONS_MOVIES
+TV_INSTRUCTIONS = Config.UPLOAD_INSTRUCTIONS_TV
+
+# Media directories, created once by Config.validate() in init_db()
+PENDING_MOVIES_PATH = Config.PENDING_MOVIES_PATH
+PENDING_TV_PATH = Config.PENDING_TV_PATH
+PLEX_MOVIES_PATH = Config.PLEX_MOVIES_PATH
+PLEX_TV_PATH = Config.PLEX_TV_PATH
+
+# Browser/CDN cache lifetime for static images, in seconds
+STATIC_MAX_AGE = 86400
+
+# Short cache lifetimes so the edge can answer repeat polls and page loads
+HEALTH_CACHE_CONTROL = 'public, max-age=10'
+HEALTH_CDN_CACHE_CONTROL = 'public, max-age=60'
+INDEX_CACHE_CONTROL = 'private, max-age=30'
+
+# scrypt cost parameters for new admin password hashes (16 MiB, ~50 ms)
+SCRYPT_N = 1 << 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# SQL used by request handlers. Shared string objects keep sqlite3's
+# prepared statement cache hot across requests.
+SQL_SELECT_ADMIN = 'SELECT password_hash, salt, iterations, must_change_password FROM admin WHERE id = 1'
+SQL_UPDATE_LAST_LOGIN = 'UPDATE admin SET last_login = ? WHERE id = 1'
+SQL_UPDATE_PASSWORD = '''
+    UPDATE admin SET password_hash = ?, salt = ?, iterations = NULL, must_change_password = 0
+    WHERE id = 1
+'''
+SQL_UPGRADE_PASSWORD = 'UPDATE admin SET password_hash = ?, salt = ?, iterations = NULL WHERE id = 1'
+SQL_SELECT_MUST_CHANGE = 'SELECT must_change_password FROM admin WHERE id = 1'
+SQL_INSERT_UPLOAD = '''
+    INSERT INTO uploads (id, filename, original_filename, media_type, uploader_email, upload_date, file_size)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_SELECT_UPLOAD_FOR_REVIEW = '''
+    SELECT filename, original_filename, media_type, uploader_email, status FROM uploads WHERE id = ?
+'''
+# Takes a JSON array of ids so the statement text (and its cache entry) never changes
+SQL_SELECT_UPLOADS_FOR_REVIEW = '''
+    SELECT id, filename, original_filename, media_type, uploader_email, status FROM uploads
+    WHERE id IN (SELECT value FROM json_each(?))
+'''
+SQL_SELECT_UPLOAD_STATUS = '''
+    SELECT id, original_filename, status, media_type, upload_date, reviewed_date FROM uploads WHERE id = ?
+'''
+# Each half is ordered by its own index; there is deliberately no outer ORDER BY,
+# which would re-sort every pending row in a temp B-tree. admin_panel() splits
+# the rows on bucket.
+SQL_SELECT_ADMIN_PANEL = '''
+    SELECT * FROM (
+        SELECT 0 AS bucket,
+               id, original_filename, media_type, uploader_email, file_size, upload_date, status, notes
+        FROM uploads WHERE status = 'pending'
+        ORDER BY upload_date DESC
+    )
+    UNION ALL
+    SELECT * FROM (
+        SELECT 1 AS bucket,
+               id, original_filename, media_type, uploader_email, file_size, upload_date, status, notes
+        FROM uploads WHERE status != 'pending'
+        ORDER BY reviewed_date DESC LIMIT 50
+    )
+'''
+SQL_SELECT_USER_UPLOADS = '''
+    SELECT original_filename, media_type, upload_date, file_size, status FROM uploads
+    WHERE uploader_email = ? ORDER BY upload_date DESC
+'''
+SQL_UPDATE_APPROVED = "UPDATE uploads SET status = 'approved', reviewed_date = ? WHERE id = ?"
+SQL_UPDATE_DENIED = "UPDATE uploads SET status = 'denied', reviewed_date = ?, notes = ? WHERE id = ?"
+
+
+# One long-lived connection per worker thread
+_local = threading.local()
+
+# journal_mode=WAL is stored in the database file, so it only needs setting once
+_wal_enabled = False
+
+# Notifications run here so responses don't wait on SMTP/HTTP
+background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='background')
+atexit.register(background_executor.shutdown, wait=True)
+
+
+def connect_db():
+    """Open a new database connection tuned for concurrent access."""
+    global _wal_enabled
+    
+    db = sqlite3.connect(DATABASE, check_same_thread=False, isolation_level=None,
+                         cached_statements=128)
+    db.row_factory = sqlite3.Row
+    if not _wal_enabled:
+        db.execute('PRAGMA journal_mode=WAL')
+        _wal_enabled = True
+    db.execute('PRAGMA busy_timeout=5000')
+    db.execute('PRAGMA foreign_keys=ON')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.execute('PRAGMA temp_store=MEMORY')
+    db.execute('PRAGMA cache_size=-20000')
+    # Checkpoint less often and read pages through a 256 MiB memory map
+    db.execute('PRAGMA wal_autocheckpoint=10000')
+    db.execute('PRAGMA mmap_size=268435456')
+    return db
+
 
 def get_db():
-    """Get database connection."""
-    db = getattr(g, '_database', None)
+    """Get this thread's database connection, opening it on first use."""
+    # A plain dict lookup; getattr() with a default raises and catches on a miss
+    db = _local.__dict__.get('connection')
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = _local.connection = connect_db()
     return db
 
 
+@contextmanager
+def write_transaction():
+    """Run the enclosed writes in one transaction that takes the write lock up front.
+    
+    BEGIN IMMEDIATE waits (up to busy_timeout) for the lock here instead of
+    failing with SQLITE_BUSY midway when a deferred transaction upgrades.
+    """
+    db = get_db()
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        yield db
+    except BaseException:
+        db.rollback()
+        raise
+    db.execute('COMMIT')
+
+
 @app.teardown_appcontext
 def close_connection(exception):
-    """Close database connection on app teardown."""
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    """Roll back anything a failed request left open; the connection is reused."""
+    db = _local.__dict__.get('connection')
+    if db is not None and db.in_transaction:
+        db.rollback()
 
 
 def init_db():
-    """Initialize the database schema."""
+    """Initialize the database schema and media directories."""
+    for error in Config.validate():
+        app.logger.error(error)
+    
     with app.app_context():
         db = get_db()
-        db.execute('''
+        # Schema setup runs as one script in a single transaction
+        db.executescript('''
+            BEGIN;
+            
             CREATE TABLE IF NOT EXISTS uploads (
                 id TEXT PRIMARY KEY,
                 filename TEXT NOT NULL,
@@ -64,42 +202,99 @@ def init_db():
                 reviewed_date TEXT,
                 file_size INTEGER,
                 notes TEXT
-            )
-        ''')
-        
-        # Admin table for authentication
-        db.execute('''
+            );
+            
+            -- Indexes backing the admin panel and my-uploads listings
+            CREATE INDEX IF NOT EXISTS idx_uploads_status_date ON uploads(status, upload_date DESC);
+            CREATE INDEX IF NOT EXISTS idx_uploads_reviewed ON uploads(reviewed_date DESC)
+                WHERE status != 'pending';
+            CREATE INDEX IF NOT EXISTS idx_uploads_email_date ON uploads(uploader_email, upload_date DESC);
+            
+            -- Admin table for authentication
             CREATE TABLE IF NOT EXISTS admin (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 password_hash TEXT NOT NULL,
                 must_change_password INTEGER DEFAULT 1,
                 created_at TEXT,
-                last_login TEXT
-            )
+                last_login TEXT,
+                salt BLOB,
+                iterations INTEGER
+            );
+            
+            COMMIT;
         ''')
         
+        # Add KDF columns to admin tables created before salted hashing
+        admin_columns = {row['name'] for row in db.execute('PRAGMA table_info(admin)')}
+        if 'salt' not in admin_columns:
+            db.execute('ALTER TABLE admin ADD COLUMN salt BLOB')
+        if 'iterations' not in admin_columns:
+            db.execute('ALTER TABLE admin ADD COLUMN iterations INTEGER')
+        
         # Check if admin exists, if not create with default password
         cursor = db.execute('SELECT COUNT(*) FROM admin')
         if cursor.fetchone()[0] == 0:
             # Default password is "admin" - must be changed on first login
-            default_hash = hashlib.sha256('admin'.encode()).hexdigest()
-            db.execute('INSERT INTO admin (password_hash, must_change_password, created_at) VALUES (?, 1, ?)', 
-                       (default_hash, datetime.now().isoformat()))
+            default_hash, salt = make_password_hash('admin')
+            db.execute('''
+                INSERT INTO admin (password_hash, salt, must_change_password, created_at)
+                VALUES (?, ?, 1, ?)
+            ''', (default_hash, salt, now_iso()))
         
         db.commit()
 
 
-def hash_password(password):
-    """Hash a password using SHA-256."""
-    return hashlib.sha256(password.encode()).hexdigest()
+def now_iso():
+    """Current local time as an ISO 8601 string with second precision."""
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def hash_password(password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """Hash a password with scrypt, recording the cost parameters alongside the digest."""
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=32)
+    return f"scrypt${n}${r}${p}${digest.hex()}"
+
+
+def make_password_hash(password):
+    """Hash a password with a fresh random salt. Returns (hash, salt)."""
+    salt = secrets.token_bytes(16)
+    return hash_password(password, salt), salt
+
+
+def verify_password(admin, password):
+    """Check a password against the stored admin row in constant time."""
+    stored = admin['password_hash']
+    if admin['salt'] is None:
+        # Legacy unsalted SHA-256 hash, rehashed on the next successful login
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+    elif stored.startswith('scrypt$'):
+        n, r, p = (int(part) for part in stored.split('$')[1:4])
+        candidate = hash_password(password, admin['salt'], n, r, p)
+    else:
+        # PBKDF2 hash from before scrypt, also rehashed on the next login
+        candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), admin['salt'], admin['iterations']).hex()
+    return hmac.compare_digest(candidate, stored)
+
+
+def needs_rehash(admin):
+    """Whether the stored hash predates the current scrypt parameters."""
+    return not admin['password_hash'].startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+@app.before_request
+def resolve_user_email():
+    """Resolve the user's email from Cloudflare Access headers once per request."""
+    # Read the WSGI environ directly rather than through EnvironHeaders
+    environ = request.environ
+    g.user_email = (
+        environ.get('HTTP_CF_ACCESS_AUTHENTICATED_USER_EMAIL')
+        or environ.get('HTTP_X_USER_EMAIL', 'anonymous@example.com')
+    )
 
 
 def get_user_email():
-    """Get user email from Cloudflare Access headers or fallback."""
-    cf_email = request.headers.get('Cf-Access-Authenticated-User-Email')
-    if cf_email:
-        return cf_email
-    return request.headers.get('X-User-Email', 'anonymous@example.com')
+    """Get the current user's email, resolved in resolve_user_email()."""
+    return g.user_email
 
 
 def admin_required(f):
@@ -112,35 +307,259 @@ def admin_required(f):
     return decorated_function
 
 
+ALLOWED_EXTENSIONS = frozenset({
+    'mp4', 'mkv', 'avi', 'mov', 'wmv', 'flv', 'webm',
+    'm4v', 'mpg', 'mpeg', 'ts', 'vob', 'iso'
+})
+ALLOWED_FILE_RE = re.compile(
+    r'\.(?:' + '|'.join(sorted(ALLOWED_EXTENSIONS)) + r')\Z', re.IGNORECASE
+)
+
+
 def allowed_file(filename):
     """Check if file extension is allowed."""
-    allowed_extensions = {
-        'mp4', 'mkv', 'avi', 'mov', 'wmv', 'flv', 'webm',
-        'm4v', 'mpg', 'mpeg', 'ts', 'vob', 'iso'
-    }
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
+    return ALLOWED_FILE_RE.search(filename) is not None
+
+
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+# Upload columns the server generates itself, so they never need HTML escaping.
+# media_type comes straight from the upload form and is deliberately excluded.
+SAFE_UPLOAD_COLUMNS = ('id', 'upload_date', 'reviewed_date', 'status')
 
+# Copy buffer for writing uploads to disk; media files are large
+UPLOAD_CHUNK_SIZE = 1 << 20
 
+# ioctl request number for a reflink clone (linux/fs.h)
+FICLONE = 0x40049409
+
+
+def rows_for_template(rows):
+    """Convert upload rows to dicts with the server-generated columns marked safe."""
+    uploads = []
+    for row in rows:
+        upload = dict(row)
+        for column in SAFE_UPLOAD_COLUMNS:
+            if upload.get(column) is not None:
+                upload[column] = Markup(upload[column])
+        uploads.append(upload)
+    return uploads
+
+
+@app.template_global()
 def get_file_size_str(size_bytes):
     """Convert bytes to human readable string."""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.2f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.2f} PB"
+    # Each unit is 2**10 times the last, so the bit length picks it directly
+    exponent = min(max(0, (int(size_bytes).bit_length() - 1) // 10), 5)
+    return f"{size_bytes / (1 << (exponent * 10)):.2f} {SIZE_UNITS[exponent]}"
+
+
+def save_upload(stream, dest):
+    """Write an upload stream to dest in large chunks and return its size in bytes.
+    
+    The data goes to dest + '.part' first and is renamed over dest only once
+    complete, so a dropped connection never leaves a truncated file at dest.
+    dest's folder is created here; its parent is made once at startup.
+    """
+    temp_path = dest + '.part'
+    try:
+        os.mkdir(os.path.dirname(dest))
+        with open(temp_path, 'wb', buffering=UPLOAD_CHUNK_SIZE) as out:
+            shutil.copyfileobj(stream, out, UPLOAD_CHUNK_SIZE)
+            out.flush()
+            size = os.fstat(out.fileno()).st_size
+        os.replace(temp_path, dest)
+        return size
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def library_filename(filename):
+    """Reduce a user-supplied filename to a bare name that is safe to use in the library.
+    
+    Unlike secure_filename() this keeps spaces and brackets, since Plex
+    matches on names like "Movie (2010).mkv".
+    """
+    name = os.path.basename(filename.replace('\\', '/')).strip()
+    name = ''.join(ch for ch in name if ch.isprintable()).lstrip('.')
+    return name or secure_filename(filename) or 'upload'
+
+
+def pending_upload_path(upload_id, original_filename, media_type):
+    """Return the stored filename and full pending path for a new upload.
+    
+    Each upload gets its own {upload_id}/ folder, so the file keeps the name
+    it will have in the Plex library and approving it is a plain rename.
+    """
+    upload_dir = PENDING_TV_PATH if media_type == 'tv' else PENDING_MOVIES_PATH
+    final_filename = f"{upload_id}/{library_filename(original_filename)}"
+    return final_filename, os.path.join(upload_dir, final_filename)
+
+
+def remove_upload_dir(file_path):
+    """Remove the per-upload pending folder around file_path once it is empty."""
+    try:
+        os.rmdir(os.path.dirname(file_path))
+    except OSError:
+        pass
+
+
+def record_upload(upload_id, final_filename, original_filename, media_type, user_email, file_size):
+    """Store a saved upload, notify about it in the background and build the response."""
+    with write_transaction() as db:
+        db.execute(SQL_INSERT_UPLOAD, (upload_id, final_filename, original_filename, media_type,
+                                       user_email, now_iso(), file_size))
+
+    run_in_background(
+        "Failed to send notification",
+        send_upload_notification,
+        uploader_email=user_email,
+        filename=original_filename,
+        media_type=media_type,
+        upload_id=upload_id
+    )
+
+    return jsonify({
+        'success': True,
+        'message': 'Upload successful! You will receive an email when your upload is reviewed.',
+        'upload_id': upload_id
+    })
+
+
+def run_in_background(error_message, func, **kwargs):
+    """Run func on the background executor, logging any exception it raises."""
+    def log_error(future):
+        e = future.exception()
+        if e is not None:
+            app.logger.error(f"{error_message}: {e}")
+    
+    background_executor.submit(func, **kwargs).add_done_callback(log_error)
+
+
+def clone_file(source, dest):
+    """Copy source to dest inside the kernel, sharing extents where the filesystem allows."""
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        # Reflink (btrfs, XFS, ...): an O(1) copy-on-write clone
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            pass
+        
+        remaining = os.fstat(src.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+            if copied == 0:
+                # Some kernels/filesystems stop early; let the caller fall back
+                raise OSError(errno.EIO, f"copy_file_range stopped with {remaining} bytes left", source)
+            remaining -= copied
+
+
+def move_file(source, dest):
+    """Move a file, renaming in place when both paths share a filesystem."""
+    try:
+        os.rename(source, dest)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    
+    # Different mounts: try a reflink/in-kernel copy, then fall back to
+    # copyfile (sendfile() on Linux), skipping the metadata copy shutil.move does
+    try:
+        try:
+            clone_file(source, dest)
+        except OSError:
+            shutil.copyfile(source, dest)
+        
+        # Never delete the only full copy unless the new one is complete
+        source_size, dest_size = os.path.getsize(source), os.path.getsize(dest)
+        if dest_size != source_size:
+            raise OSError(errno.EIO, f"Copied {dest_size} of {source_size} bytes", dest)
+    except Exception:
+        if os.path.exists(dest):
+            os.remove(dest)
+        raise
+    os.remove(source)
+
+
+def publish_upload(upload):
+    """Move an approved upload from its pending folder into the Plex library folder."""
+    if upload['media_type'] == 'tv':
+        source_dir, dest_dir = PENDING_TV_PATH, PLEX_TV_PATH
+    else:
+        source_dir, dest_dir = PENDING_MOVIES_PATH, PLEX_MOVIES_PATH
+    
+    source_path = os.path.join(source_dir, upload['filename'])
+    move_file(source_path, os.path.join(dest_dir, library_filename(upload['original_filename'])))
+    
+    # Uploads from before per-upload folders sit directly in the pending folder
+    if '/' in upload['filename']:
+        remove_upload_dir(source_path)
+
+
+def discard_upload(upload):
+    """Delete a denied upload's pending file, logging rather than raising on failure."""
+    source_dir = PENDING_TV_PATH if upload['media_type'] == 'tv' else PENDING_MOVIES_PATH
+    source_path = os.path.join(source_dir, upload['filename'])
+    
+    try:
+        if os.path.exists(source_path):
+            os.remove(source_path)
+    except Exception as e:
+        app.logger.error(f"Failed to delete file: {e}")
+    
+    if '/' in upload['filename']:
+        remove_upload_dir(source_path)
+
+
+def schedule_plex_scan(media_type):
+    """Refresh the Plex library for media_type shortly, sharing the scan with other approvals."""
+    if media_type == 'tv':
+        queue_plex_scan(Config.PLEX_TV_LIBRARY, Config.PLEX_TV_SECTION_ID)
+    else:
+        queue_plex_scan(Config.PLEX_MOVIES_LIBRARY, Config.PLEX_MOVIE_SECTION_ID)
+
+
+def notify_approved(upload):
+    """Email and post about an approved upload in the background."""
+    run_in_background(
+        "Failed to send approval notification",
+        send_approval_notification,
+        uploader_email=upload['uploader_email'],
+        filename=upload['original_filename'],
+        media_type=upload['media_type']
+    )
+
+
+def notify_denied(upload, notes):
+    """Email and post about a denied upload in the background."""
+    run_in_background(
+        "Failed to send denial notification",
+        send_denial_notification,
+        uploader_email=upload['uploader_email'],
+        filename=upload['original_filename'],
+        notes=notes
+    )
 
 
 @app.route('/')
 def index():
     """Main upload page."""
     user_email = get_user_email()
-    return render_template(
+    response = make_response(render_template(
         'upload.html',
         user_email=user_email,
-        movie_instructions=Config.UPLOAD_INSTRUCTIONS_MOVIES,
-        tv_instructions=Config.UPLOAD_INSTRUCTIONS_TV,
-        app_name=Config.APP_NAME
-    )
+        movie_instructions=MOVIE_INSTRUCTIONS,
+        tv_instructions=TV_INSTRUCTIONS,
+        app_name=APP_NAME
+    ))
+    # The page only varies by user (and by env vars, which need a restart)
+    response.headers['Cache-Control'] = INDEX_CACHE_CONTROL
+    response.vary.add('Cf-Access-Authenticated-User-Email')
+    return response
 
 
 @app.route('/upload', methods=['POST'])
@@ -159,48 +578,46 @@ def upload_file():
     if not allowed_file(file.filename):
         return jsonify({'error': 'File type not allowed. Please upload video files only.'}), 400
 
-    upload_id = str(uuid.uuid4())
+    upload_id = secrets.token_hex(16)
     original_filename = file.filename
-    secure_name = secure_filename(original_filename)
-
-    if media_type == 'tv':
-        upload_path = Path(Config.PENDING_TV_PATH)
-    else:
-        upload_path = Path(Config.PENDING_MOVIES_PATH)
-
-    upload_path.mkdir(parents=True, exist_ok=True)
-
-    final_filename = f"{upload_id}_{secure_name}"
-    file_path = upload_path / final_filename
+    final_filename, file_path = pending_upload_path(upload_id, original_filename, media_type)
 
     try:
-        file.save(str(file_path))
-        file_size = os.path.getsize(file_path)
+        file_size = save_upload(file.stream, file_path)
     except Exception as e:
+        remove_upload_dir(file_path)
         return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
 
-    db = get_db()
-    db.execute('''
-        INSERT INTO uploads (id, filename, original_filename, media_type, uploader_email, upload_date, file_size)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (upload_id, final_filename, original_filename, media_type, user_email, datetime.now().isoformat(), file_size))
-    db.commit()
+    return record_upload(upload_id, final_filename, original_filename, media_type, user_email, file_size)
+
+
+@app.route('/upload/stream', methods=['POST'])
+def upload_file_stream():
+    """Handle a raw-body upload, writing the request stream straight to disk.
+    
+    Skips the multipart parser and its temporary spool file. The filename
+    (URI-encoded) and media type travel in the X-Filename and X-Media-Type headers.
+    """
+    original_filename = unquote(request.headers.get('X-Filename', ''))
+    media_type = request.headers.get('X-Media-Type', 'movie')
+    user_email = get_user_email()
+
+    if not original_filename:
+        return jsonify({'error': 'No file selected'}), 400
+
+    if not allowed_file(original_filename):
+        return jsonify({'error': 'File type not allowed. Please upload video files only.'}), 400
+
+    upload_id = secrets.token_hex(16)
+    final_filename, file_path = pending_upload_path(upload_id, original_filename, media_type)
 
     try:
-        send_upload_notification(
-            uploader_email=user_email,
-            filename=original_filename,
-            media_type=media_type,
-            upload_id=upload_id
-        )
+        file_size = save_upload(request.stream, file_path)
     except Exception as e:
-        app.logger.error(f"Failed to send notification: {e}")
+        remove_upload_dir(file_path)
+        return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
 
-    return jsonify({
-        'success': True,
-        'message': 'Upload successful! You will receive an email when your upload is reviewed.',
-        'upload_id': upload_id
-    })
+    return record_upload(upload_id, final_filename, original_filename, media_type, user_email, file_size)
 
 
 # ============ Admin Authentication Routes ============
@@ -213,34 +630,41 @@ def admin_login():
     
     if request.method == 'POST':
         password = request.form.get('password', '')
-        password_hash = hash_password(password)
         
-        db = get_db()
-        admin = db.execute('SELECT * FROM admin WHERE id = 1').fetchone()
+        admin = get_db().execute(SQL_SELECT_ADMIN).fetchone()
         
-        if admin and admin['password_hash'] == password_hash:
+        if admin and verify_password(admin, password):
             session['admin_logged_in'] = True
-            db.execute('UPDATE admin SET last_login = ? WHERE id = 1', (datetime.now().isoformat(),))
-            db.commit()
+            session['must_change_password'] = bool(admin['must_change_password'])
+            
+            # Upgrade older hashes now that we know the plaintext
+            upgrade = make_password_hash(password) if needs_rehash(admin) else None
+            
+            with write_transaction() as db:
+                db.execute(SQL_UPDATE_LAST_LOGIN, (now_iso(),))
+                if upgrade:
+                    db.execute(SQL_UPGRADE_PASSWORD, upgrade)
             
             # Check if password needs to be changed
-            if admin['must_change_password']:
+            if session['must_change_password']:
                 return redirect(url_for('admin_change_password'))
             
             return redirect(url_for('admin_panel'))
         else:
             flash('Invalid password', 'error')
     
-    return render_template('admin_login.html', app_name=Config.APP_NAME)
+    return render_template('admin_login.html', app_name=APP_NAME)
 
 
 @app.route('/admin/change-password', methods=['GET', 'POST'])
 @admin_required
 def admin_change_password():
     """Force password change page."""
-    db = get_db()
-    admin = db.execute('SELECT must_change_password FROM admin WHERE id = 1').fetchone()
-    force_change = admin['must_change_password'] if admin else False
+    # Set at login; only sessions from before it was cached need the DB
+    force_change = session.get('must_change_password')
+    if force_change is None:
+        admin = get_db().execute(SQL_SELECT_MUST_CHANGE).fetchone()
+        force_change = session['must_change_password'] = bool(admin and admin['must_change_password'])
     
     if request.method == 'POST':
         new_password = request.form.get('new_password', '')
@@ -253,15 +677,15 @@ def admin_change_password():
         elif new_password == 'admin':
             flash('Please choose a different password', 'error')
         else:
-            new_hash = hash_password(new_password)
-            db.execute('UPDATE admin SET password_hash = ?, must_change_password = 0 WHERE id = 1',
-                       (new_hash,))
-            db.commit()
+            new_hash, salt = make_password_hash(new_password)
+            with write_transaction() as db:
+                db.execute(SQL_UPDATE_PASSWORD, (new_hash, salt))
+            session['must_change_password'] = False
             flash('Password changed successfully!', 'success')
             return redirect(url_for('admin_panel'))
     
     return render_template('admin_change_password.html', 
-                          app_name=Config.APP_NAME, 
+                          app_name=APP_NAME, 
                           force_change=force_change)
 
 
@@ -269,6 +693,7 @@ def admin_change_password():
 def admin_logout():
     """Log out of admin session."""
     session.pop('admin_logged_in', None)
+    session.pop('must_change_password', None)
     flash('Logged out successfully', 'success')
     return redirect(url_for('index'))
 
@@ -281,20 +706,16 @@ def admin_panel():
     """Admin panel for reviewing uploads."""
     db = get_db()
 
-    pending = db.execute('''
-        SELECT * FROM uploads WHERE status = 'pending' ORDER BY upload_date DESC
-    ''').fetchall()
-
-    processed = db.execute('''
-        SELECT * FROM uploads WHERE status != 'pending' ORDER BY reviewed_date DESC LIMIT 50
-    ''').fetchall()
+    # Pending and recently processed uploads in one round trip
+    rows = rows_for_template(db.execute(SQL_SELECT_ADMIN_PANEL))
+    pending = [row for row in rows if row['bucket'] == 0]
+    processed = [row for row in rows if row['bucket'] == 1]
 
     return render_template(
         'admin.html',
         pending=pending,
-        processed=processed,
-        app_name=Config.APP_NAME,
-        get_file_size_str=get_file_size_str
+        recent=processed,
+        app_name=APP_NAME
     )
 
 
@@ -304,7 +725,7 @@ def approve_upload(upload_id):
     """Approve an upload and move to Plex library."""
     db = get_db()
 
-    upload = db.execute('SELECT * FROM uploads WHERE id = ?', (upload_id,)).fetchone()
+    upload = db.execute(SQL_SELECT_UPLOAD_FOR_REVIEW, (upload_id,)).fetchone()
 
     if not upload:
         return jsonify({'error': 'Upload not found'}), 404
@@ -312,44 +733,16 @@ def approve_upload(upload_id):
     if upload['status'] != 'pending':
         return jsonify({'error': 'Upload already processed'}), 400
 
-    if upload['media_type'] == 'tv':
-        source_dir = Path(Config.PENDING_TV_PATH)
-        dest_dir = Path(Config.PLEX_TV_PATH)
-        library_name = Config.PLEX_TV_LIBRARY
-    else:
-        source_dir = Path(Config.PENDING_MOVIES_PATH)
-        dest_dir = Path(Config.PLEX_MOVIES_PATH)
-        library_name = Config.PLEX_MOVIES_LIBRARY
-
-    source_path = source_dir / upload['filename']
-
-    dest_dir.mkdir(parents=True, exist_ok=True)
-
-    dest_path = dest_dir / upload['original_filename']
-
     try:
-        shutil.move(str(source_path), str(dest_path))
+        publish_upload(upload)
     except Exception as e:
         return jsonify({'error': f'Failed to move file: {str(e)}'}), 500
 
-    db.execute('''
-        UPDATE uploads SET status = 'approved', reviewed_date = ? WHERE id = ?
-    ''', (datetime.now().isoformat(), upload_id))
-    db.commit()
+    with write_transaction() as db:
+        db.execute(SQL_UPDATE_APPROVED, (now_iso(), upload_id))
 
-    try:
-        trigger_plex_scan(library_name)
-    except Exception as e:
-        app.logger.error(f"Failed to trigger Plex scan: {e}")
-
-    try:
-        send_approval_notification(
-            uploader_email=upload['uploader_email'],
-            filename=upload['original_filename'],
-            media_type=upload['media_type']
-        )
-    except Exception as e:
-        app.logger.error(f"Failed to send approval notification: {e}")
+    schedule_plex_scan(upload['media_type'])
+    notify_approved(upload)
 
     return jsonify({'success': True, 'message': 'Upload approved and added to Plex!'})
 
@@ -361,7 +754,7 @@ def deny_upload(upload_id):
     db = get_db()
     notes = request.form.get('notes', '')
 
-    upload = db.execute('SELECT * FROM uploads WHERE id = ?', (upload_id,)).fetchone()
+    upload = db.execute(SQL_SELECT_UPLOAD_FOR_REVIEW, (upload_id,)).fetchone()
 
     if not upload:
         return jsonify({'error': 'Upload not found'}), 404
@@ -369,41 +762,109 @@ def deny_upload(upload_id):
     if upload['status'] != 'pending':
         return jsonify({'error': 'Upload already processed'}), 400
 
-    if upload['media_type'] == 'tv':
-        source_dir = Path(Config.PENDING_TV_PATH)
-    else:
-        source_dir = Path(Config.PENDING_MOVIES_PATH)
+    discard_upload(upload)
 
-    source_path = source_dir / upload['filename']
+    with write_transaction() as db:
+        db.execute(SQL_UPDATE_DENIED, (now_iso(), notes, upload_id))
 
-    try:
-        if source_path.exists():
-            os.remove(str(source_path))
-    except Exception as e:
-        app.logger.error(f"Failed to delete file: {e}")
+    notify_denied(upload, notes)
 
-    db.execute('''
-        UPDATE uploads SET status = 'denied', reviewed_date = ?, notes = ? WHERE id = ?
-    ''', (datetime.now().isoformat(), notes, upload_id))
-    db.commit()
+    return jsonify({'success': True, 'message': 'Upload denied and file deleted.'})
 
-    try:
-        send_denial_notification(
-            uploader_email=upload['uploader_email'],
-            filename=upload['original_filename'],
-            notes=notes
-        )
-    except Exception as e:
-        app.logger.error(f"Failed to send denial notification: {e}")
 
-    return jsonify({'success': True, 'message': 'Upload denied and file deleted.'})
+def pending_uploads_for_review(upload_ids):
+    """Look up the requested uploads, splitting out ids that can't be reviewed.
+    
+    Returns (uploads, errors) where errors maps upload id -> message.
+    """
+    rows = get_db().execute(SQL_SELECT_UPLOADS_FOR_REVIEW, (json.dumps(upload_ids),)).fetchall()
+    found = {row['id']: row for row in rows}
+    
+    uploads, errors = [], {}
+    for upload_id in dict.fromkeys(upload_ids):
+        upload = found.get(upload_id)
+        if upload is None:
+            errors[upload_id] = 'Upload not found'
+        elif upload['status'] != 'pending':
+            errors[upload_id] = 'Upload already processed'
+        else:
+            uploads.append(upload)
+    return uploads, errors
+
+
+@app.route('/admin/bulk-approve', methods=['POST'])
+@admin_required
+def bulk_approve_uploads():
+    """Approve several uploads, recording them in one transaction."""
+    upload_ids = request.form.getlist('upload_ids')
+    if not upload_ids:
+        return jsonify({'error': 'No uploads selected'}), 400
+
+    uploads, errors = pending_uploads_for_review(upload_ids)
+
+    approved = []
+    for upload in uploads:
+        try:
+            publish_upload(upload)
+        except Exception as e:
+            errors[upload['id']] = f'Failed to move file: {str(e)}'
+        else:
+            approved.append(upload)
+
+    if approved:
+        reviewed_date = now_iso()
+        with write_transaction() as db:
+            db.executemany(SQL_UPDATE_APPROVED, [(reviewed_date, upload['id']) for upload in approved])
+
+        # One scan per affected library, however many files landed in it
+        for media_type in {upload['media_type'] for upload in approved}:
+            schedule_plex_scan(media_type)
+        for upload in approved:
+            notify_approved(upload)
+
+    return jsonify({
+        'success': not errors,
+        'message': f'{len(approved)} upload(s) approved and added to Plex.',
+        'approved': [upload['id'] for upload in approved],
+        'errors': errors
+    })
+
+
+@app.route('/admin/bulk-deny', methods=['POST'])
+@admin_required
+def bulk_deny_uploads():
+    """Deny several uploads, recording them in one transaction."""
+    upload_ids = request.form.getlist('upload_ids')
+    notes = request.form.get('notes', '')
+    if not upload_ids:
+        return jsonify({'error': 'No uploads selected'}), 400
+
+    uploads, errors = pending_uploads_for_review(upload_ids)
+
+    if uploads:
+        for upload in uploads:
+            discard_upload(upload)
+
+        reviewed_date = now_iso()
+        with write_transaction() as db:
+            db.executemany(SQL_UPDATE_DENIED, [(reviewed_date, notes, upload['id']) for upload in uploads])
+
+        for upload in uploads:
+            notify_denied(upload, notes)
+
+    return jsonify({
+        'success': not errors,
+        'message': f'{len(uploads)} upload(s) denied and deleted.',
+        'denied': [upload['id'] for upload in uploads],
+        'errors': errors
+    })
 
 
 @app.route('/status/<upload_id>')
 def upload_status(upload_id):
     """Check status of an upload."""
     db = get_db()
-    upload = db.execute('SELECT * FROM uploads WHERE id = ?', (upload_id,)).fetchone()
+    upload = db.execute(SQL_SELECT_UPLOAD_STATUS, (upload_id,)).fetchone()
 
     if not upload:
         return jsonify({'error': 'Upload not found'}), 404
@@ -424,29 +885,30 @@ def my_uploads():
     user_email = get_user_email()
     db = get_db()
 
-    uploads = db.execute('''
-        SELECT * FROM uploads WHERE uploader_email = ? ORDER BY upload_date DESC
-    ''', (user_email,)).fetchall()
+    uploads = rows_for_template(db.execute(SQL_SELECT_USER_UPLOADS, (user_email,)))
 
     return render_template(
         'my_uploads.html',
         uploads=uploads,
         user_email=user_email,
-        app_name=Config.APP_NAME,
-        get_file_size_str=get_file_size_str
+        app_name=APP_NAME
     )
 
 
 @app.route('/static/img/<path:filename>')
 def serve_image(filename):
     """Serve static images."""
-    return send_from_directory('static/img', filename)
+    # Let browsers and Cloudflare cache these; repeat views revalidate to a 304
+    return send_from_directory('static/img', filename, conditional=True, max_age=STATIC_MAX_AGE)
 
 
 @app.route('/health')
 def health_check():
     """Health check endpoint."""
-    return jsonify({'status': 'healthy', 'app': Config.APP_NAME})
+    response = jsonify({'status': 'healthy', 'app': APP_NAME})
+    response.headers['Cache-Control'] = HEALTH_CACHE_CONTROL
+    response.headers['CDN-Cache-Control'] = HEALTH_CDN_CACHE_CONTROL
+    return response
 
 
 @app.errorhandler(413)
@@ -3,262 +3,667 @@ Notification module for Bozloader.
 Handles email and Discord webhook notifications.
 """
 
-import smtplib
+import atexit
+import html
 import json
+import queue
+import re
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import wraps
+from string import Template
+from email.message import Message
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import urllib.request
-import urllib.error
+
+import requests
+from requests.adapters import HTTPAdapter
 
 from config import Config
 
 
-def send_email(to_email: str, subject: str, html_body: str, text_body: str = None):
-    """Send an email notification."""
+# Shared keep-alive session so webhook calls reuse the TLS connection to Discord
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Discord webhook limits: 10 embeds and 6000 embed characters per message,
+# 1024 characters per field value, 5 requests per second
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_EMBED_CHARS = 6000
+DISCORD_MAX_FIELD_VALUE = 1024
+DISCORD_MIN_INTERVAL = 0.2
+DISCORD_BATCH_WINDOW = 1.0  # seconds to wait for more embeds before posting
+DISCORD_MAX_ATTEMPTS = 5
+DISCORD_BACKOFF_BASE = 0.5  # seconds; doubles after each 5xx or connection error
+DISCORD_TIMEOUT = (2, 10)  # (connect, read) seconds; fail fast if Discord is unreachable
+_DISCORD_HEADERS = {'Content-Type': 'application/json'}
+
+_discord_queue = queue.Queue()
+_discord_overflow = None  # notification that didn't fit the last batch; worker thread only
+_discord_worker = None
+_discord_worker_lock = threading.Lock()
+
+# Runs the independent email sends of one notification side by side
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='notify')
+atexit.register(_executor.shutdown, wait=True)
+
+# Identical notification calls within this many seconds are sent only once
+NOTIFICATION_DEDUPE_TTL = 60
+
+# Each sending thread keeps its SMTP session open between messages; a timer
+# closes it after this many idle seconds so quiet threads don't hold it open
+SMTP_IDLE_TIMEOUT = 60
+_smtp_local = threading.local()
+
+
+# Static parts of the Discord embeds; senders only add the fields
+_UPLOAD_MOVIE_EMBED = {
+    "title": f"🎬 New Upload - {Config.APP_NAME}",
+    "color": 6147277,
+    "footer": {"text": f"Review at {Config.APP_URL}/admin"}
+}
+_UPLOAD_TV_EMBED = {**_UPLOAD_MOVIE_EMBED, "title": f"📺 New Upload - {Config.APP_NAME}"}
+_APPROVAL_EMBED = {"title": "✅ Upload Approved", "color": 5025616}
+_DENIAL_EMBED = {"title": "❌ Upload Denied", "color": 15220031}
+
+
+# Email bodies, built once at import. Only per-message values are substituted.
+
+# Styles shared by every HTML email; each template appends its header colours
+_CSS_BASE = """
+        body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { color: white; padding: 30px; border-radius: 10px 10px 0 0; text-align: center; }
+        .header h1 { margin: 0; font-size: 24px; }
+        .content { background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }
+        .footer { text-align: center; margin-top: 20px; color: #888; font-size: 12px; }"""
+
+_HTML_LAYOUT = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>{css}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{heading}</h1>
+        </div>
+        <div class="content">{content}
+        </div>
+        <div class="footer">
+            <p>{footer}</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_STYLE_RE = re.compile(r'<style>(.*?)</style>', re.S)
+_CSS_PUNCT_RE = re.compile(r'\s*([{};:,])\s*')
+
+
+def _minify_style(match: re.Match) -> str:
+    return '<style>' + _CSS_PUNCT_RE.sub(r'\1', match.group(1)).strip() + '</style>'
+
+
+def _minify(markup: str) -> str:
+    """Collapse whitespace runs in HTML and squeeze the spacing out of <style> blocks."""
+    return _STYLE_RE.sub(_minify_style, _WHITESPACE_RE.sub(' ', markup).strip())
+
+
+def _html_template(css: str, heading: str, content: str, footer: str) -> Template:
+    """Assemble a minified HTML email template from the shared layout and styles."""
+    return Template(_minify(_HTML_LAYOUT.format(css=_CSS_BASE + css, heading=heading, content=content, footer=footer)))
+
+
+def _e(value) -> str:
+    """Escape a value for interpolation into an HTML email body."""
+    return html.escape(str(value), quote=True)
+
+
+_UPLOAD_USER_HTML = _html_template(
+    css="""
+        .header { background: linear-gradient(135deg, #5DCDCD 0%, #3BA5A5 100%); }
+        .highlight { background: #E83D5F; color: white; padding: 3px 10px; border-radius: 4px; font-weight: bold; }""",
+    heading="🎬 $app_name",
+    content="""
+            <h2>Upload Request Received!</h2>
+            <p>Hi there,</p>
+            <p>Your upload request has been received and is pending review.</p>
+            <p><strong>File:</strong> $filename</p>
+            <p><strong>Type:</strong> <span class="highlight">$media_type_display</span></p>
+            <p>You'll receive another email once your upload has been approved or denied.</p>
+            <p>Thanks for your contribution!</p>""",
+    footer="— $app_name"
+)
+
+_UPLOAD_USER_TEXT = Template("""
+$app_name - Upload Request Received
+
+Hi there,
+
+Your upload request has been received and is pending review.
+
+File: $filename
+Type: $media_type_display
+
+You'll receive another email once your upload has been approved or denied.
+
+Thanks for your contribution!
+
+— $app_name
+""")
+
+_UPLOAD_ADMIN_HTML = _html_template(
+    css="""
+        .header { background: linear-gradient(135deg, #FFD166 0%, #E8B33D 100%); color: #333; }
+        .btn { display: inline-block; background: #5DCDCD; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; font-weight: bold; margin-top: 15px; }""",
+    heading="📬 New Upload Pending Review",
+    content="""
+            <h2>New $media_type_display Upload</h2>
+            <p><strong>File:</strong> $filename</p>
+            <p><strong>Uploader:</strong> $uploader_email</p>
+            <p><strong>Type:</strong> $media_type_display</p>
+            <a href="$app_url/admin" class="btn">Review Upload</a>""",
+    footer="— $app_name Admin"
+)
+
+_APPROVAL_HTML = _html_template(
+    css="""
+        .header { background: linear-gradient(135deg, #4CAF50 0%, #388E3C 100%); }
+        .success-badge { background: #4CAF50; color: white; padding: 8px 16px; border-radius: 20px; font-weight: bold; display: inline-block; }""",
+    heading="✅ $app_name",
+    content="""
+            <h2><span class="success-badge">APPROVED</span></h2>
+            <p>Great news! Your upload has been approved and added to Plex.</p>
+            <p><strong>File:</strong> $filename</p>
+            <p><strong>Type:</strong> $media_type_display</p>
+            <p>It should appear in your Plex library shortly.</p>
+            <p>Thanks for your contribution! 🎉</p>""",
+    footer="— $app_name"
+)
+
+_APPROVAL_TEXT = Template("""
+$app_name - Upload Approved!
+
+Great news! Your upload has been approved and added to Plex.
+
+File: $filename
+Type: $media_type_display
+
+It should appear in your Plex library shortly.
+
+Thanks for your contribution!
+
+— $app_name
+""")
+
+_DENIAL_HTML = _html_template(
+    css="""
+        .header { background: linear-gradient(135deg, #E83D5F 0%, #C42848 100%); }
+        .denied-badge { background: #E83D5F; color: white; padding: 8px 16px; border-radius: 20px; font-weight: bold; display: inline-block; }""",
+    heading="❌ $app_name",
+    content="""
+            <h2><span class="denied-badge">NOT APPROVED</span></h2>
+            <p>Unfortunately, your upload was not approved.</p>
+            <p><strong>File:</strong> $filename</p>
+            $notes_section
+            <p>Please contact the admin if you have questions.</p>""",
+    footer="— $app_name"
+)
+
+_DENIAL_TEXT = Template("""
+$app_name - Upload Not Approved
+
+Unfortunately, your upload was not approved.
+
+File: $filename$notes_text
+
+Please contact the admin if you have questions.
+
+— $app_name
+""")
+
+
+def _email_configured() -> bool:
+    """Check whether email notifications can be sent."""
     if not Config.EMAIL_ENABLED:
-        return
+        return False
     
     if not Config.SMTP_USERNAME or not Config.SMTP_PASSWORD:
         print("Email not configured - skipping notification")
-        return
+        return False
+    
+    return True
+
+
+def _build_message(to_email: str, subject: str, html_body: str, text_body: str = None) -> Message:
+    """Build a MIME message, only going multipart when there is a plain-text alternative."""
+    if text_body:
+        msg = MIMEMultipart('alternative')
+        msg.attach(MIMEText(text_body, 'plain'))
+        msg.attach(MIMEText(html_body, 'html'))
+    else:
+        msg = MIMEText(html_body, 'html')
     
-    msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
     msg['From'] = Config.SMTP_FROM
     msg['To'] = to_email
+    return msg
+
+
+def _open_smtp() -> smtplib.SMTP:
+    """Connect and log in to the configured SMTP server."""
+    if Config.SMTP_USE_TLS:
+        server = smtplib.SMTP(Config.SMTP_SERVER, Config.SMTP_PORT)
+        server.starttls()
+    else:
+        server = smtplib.SMTP_SSL(Config.SMTP_SERVER, Config.SMTP_PORT)
+    
+    server.login(Config.SMTP_USERNAME, Config.SMTP_PASSWORD)
+    return server
+
+
+def _close_smtp(server: smtplib.SMTP):
+    """Quit an SMTP session, dropping the socket if the server already went away."""
+    try:
+        server.quit()
+    except smtplib.SMTPException:
+        server.close()
+
+
+class _SmtpSlot:
+    """One thread's SMTP session and the timer that closes it once idle.
     
-    if text_body:
-        msg.attach(MIMEText(text_body, 'plain'))
+    The lock is shared with the idle timer, which runs on its own thread.
+    No timer is armed while the owning thread is using the session.
+    """
     
-    msg.attach(MIMEText(html_body, 'html'))
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.server = None
+        self.idle_timer = None
+
+
+def _smtp_slot() -> _SmtpSlot:
+    """Return this thread's SMTP slot, creating it on first use."""
+    slot = _smtp_local.__dict__.get('slot')
+    if slot is None:
+        slot = _smtp_local.slot = _SmtpSlot()
+    return slot
+
+
+def _quit_quietly(server: smtplib.SMTP):
+    """Close an SMTP session, ignoring a socket that is already gone."""
+    try:
+        _close_smtp(server)
+    except OSError:
+        pass
+
+
+def _get_smtp() -> smtplib.SMTP:
+    """Return this thread's SMTP session, opening a new one if there is none."""
+    slot = _smtp_slot()
+    with slot.lock:
+        # Disarm the idle timer; a callback already waiting on the lock sees
+        # it was superseded and leaves the session alone
+        if slot.idle_timer is not None:
+            slot.idle_timer.cancel()
+            slot.idle_timer = None
+        if slot.server is None:
+            slot.server = _open_smtp()
+        return slot.server
+
+
+def _park_smtp():
+    """Arm the timer that closes this thread's SMTP session after SMTP_IDLE_TIMEOUT."""
+    slot = _smtp_slot()
+    with slot.lock:
+        if slot.server is None:
+            return
+        timer = threading.Timer(SMTP_IDLE_TIMEOUT, _expire_smtp, args=(slot,))
+        timer.daemon = True
+        slot.idle_timer = timer
+        timer.start()
+
+
+def _expire_smtp(slot: _SmtpSlot):
+    """Idle timer callback: close the slot's session unless it was used since."""
+    with slot.lock:
+        if slot.idle_timer is not threading.current_thread():
+            return
+        server, slot.server, slot.idle_timer = slot.server, None, None
+    if server is not None:
+        _quit_quietly(server)
+
+
+def _drop_smtp():
+    """Close and forget this thread's SMTP session, if any."""
+    slot = _smtp_slot()
+    with slot.lock:
+        if slot.idle_timer is not None:
+            slot.idle_timer.cancel()
+        server, slot.server, slot.idle_timer = slot.server, None, None
+    if server is not None:
+        _quit_quietly(server)
+
+
+def _send_via(server: smtplib.SMTP, to_email: str, msg: Message):
+    """Send a prepared message over an open SMTP session."""
+    server.send_message(msg, from_addr=Config.SMTP_FROM, to_addrs=[to_email])
+    print(f"Email sent to {to_email}")
+
+
+def _send_pooled(to_email: str, msg: Message):
+    """Send over this thread's SMTP session, reconnecting once if the server dropped it."""
+    try:
+        _send_via(_get_smtp(), to_email, msg)
+    except smtplib.SMTPServerDisconnected:
+        _drop_smtp()
+        _send_via(_get_smtp(), to_email, msg)
+    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+        # The server rejected this message; the session itself is still usable
+        raise
+    except Exception:
+        _drop_smtp()
+        raise
+    finally:
+        _park_smtp()
+
+
+def send_email(to_email: str, subject: str, html_body: str, text_body: str = None):
+    """Send an email notification."""
+    if not _email_configured():
+        return
+    
+    msg = _build_message(to_email, subject, html_body, text_body)
     
     try:
-        if Config.SMTP_USE_TLS:
-            server = smtplib.SMTP(Config.SMTP_SERVER, Config.SMTP_PORT)
-            server.starttls()
-        else:
-            server = smtplib.SMTP_SSL(Config.SMTP_SERVER, Config.SMTP_PORT)
-        
-        server.login(Config.SMTP_USERNAME, Config.SMTP_PASSWORD)
-        server.sendmail(Config.SMTP_FROM, to_email, msg.as_string())
-        server.quit()
-        print(f"Email sent to {to_email}")
+        _send_pooled(to_email, msg)
     except Exception as e:
         print(f"Failed to send email: {e}")
         raise
 
 
-def send_discord_notification(message: str, embed: dict = None):
-    """Send a Discord webhook notification."""
-    if not Config.DISCORD_ENABLED or not Config.DISCORD_WEBHOOK_URL:
+def send_bulk_email(to_emails: list, subject: str, html_body: str, text_body: str = None):
+    """Send the same email to each recipient over a single SMTP connection."""
+    if not to_emails or not _email_configured():
         return
     
-    payload = {"content": message}
-    
-    if embed:
-        payload["embeds"] = [embed]
+    try:
+        _get_smtp()
+    except Exception as e:
+        print(f"Failed to send email: {e}")
+        raise
     
-    data = json.dumps(payload).encode('utf-8')
+    # Build the message once and only swap the To header per recipient
+    msg = _build_message(to_emails[0], subject, html_body, text_body)
     
-    req = urllib.request.Request(
-        Config.DISCORD_WEBHOOK_URL,
-        data=data,
-        headers={'Content-Type': 'application/json'}
-    )
+    for to_email in to_emails:
+        msg.replace_header('To', to_email)
+        try:
+            _send_pooled(to_email, msg)
+        except Exception as e:
+            print(f"Failed to send email to {to_email}: {e}")
+
+
+def send_discord_notification(message: str, embed: dict = None):
+    """Queue a Discord webhook notification for batched delivery."""
+    if not Config.DISCORD_ENABLED or not Config.DISCORD_WEBHOOK_URL:
+        return
     
-    try:
-        with urllib.request.urlopen(req) as response:
-            print(f"Discord notification sent: {response.status}")
-    except urllib.error.HTTPError as e:
-        print(f"Failed to send Discord notification: {e}")
-        raise
+    _start_discord_worker()
+    _discord_queue.put((message, embed))
 
 
-def send_upload_notification(uploader_email: str, filename: str, media_type: str, upload_id: str):
-    """Send notifications when a new upload is received."""
+def _start_discord_worker():
+    """Start the Discord delivery thread on first use."""
+    global _discord_worker
     
-    media_type_display = "Movie" if media_type == "movie" else "TV Show"
+    if _discord_worker is not None:
+        return
     
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #5DCDCD 0%, #3BA5A5 100%); color: white; padding: 30px; border-radius: 10px 10px 0 0; text-align: center; }}
-            .header h1 {{ margin: 0; font-size: 24px; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .highlight {{ background: #E83D5F; color: white; padding: 3px 10px; border-radius: 4px; font-weight: bold; }}
-            .footer {{ text-align: center; margin-top: 20px; color: #888; font-size: 12px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🎬 {Config.APP_NAME}</h1>
-            </div>
-            <div class="content">
-                <h2>Upload Request Received!</h2>
-                <p>Hi there,</p>
-                <p>Your upload request has been received and is pending review.</p>
-                <p><strong>File:</strong> {filename}</p>
-                <p><strong>Type:</strong> <span class="highlight">{media_type_display}</span></p>
-                <p>You'll receive another email once your upload has been approved or denied.</p>
-                <p>Thanks for your contribution!</p>
-            </div>
-            <div class="footer">
-                <p>— {Config.APP_NAME}</p>
-            </div>
-        </div>
-    </body>
-    </html>
+    with _discord_worker_lock:
+        if _discord_worker is None:
+            _discord_worker = threading.Thread(target=_run_discord_worker, name='discord', daemon=True)
+            _discord_worker.start()
+
+
+def _discord_field(name: str, value: str, inline: bool = False) -> dict:
+    """Build an embed field, truncating the value to Discord's per-field limit."""
+    if len(value) > DISCORD_MAX_FIELD_VALUE:
+        value = value[:DISCORD_MAX_FIELD_VALUE - 1] + "…"
+    return {"name": name, "value": value, "inline": inline}
+
+
+def _embed_length(embed: dict) -> int:
+    """Count the characters Discord charges against an embed's share of the 6000 limit."""
+    length = len(embed.get("title", "")) + len(embed.get("description", ""))
+    length += len(embed.get("footer", {}).get("text", ""))
+    length += len(embed.get("author", {}).get("name", ""))
+    for field in embed.get("fields", ()):
+        length += len(field["name"]) + len(field["value"])
+    return length
+
+
+def _next_discord_batch() -> list:
+    """Wait for a queued notification, then collect any more that arrive within the batch window.
+    
+    A notification whose embed would push the batch past DISCORD_MAX_EMBED_CHARS
+    closes the batch and starts the next one.
     """
+    global _discord_overflow
     
-    text_body = f"""
-    {Config.APP_NAME} - Upload Request Received
+    first, _discord_overflow = _discord_overflow, None
+    batch = [first if first is not None else _discord_queue.get()]
+    size = _embed_length(batch[0][1]) if batch[0][1] else 0
+    deadline = time.monotonic() + DISCORD_BATCH_WINDOW
     
-    Hi there,
+    while len(batch) < DISCORD_MAX_EMBEDS:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = _discord_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        
+        item_size = _embed_length(item[1]) if item[1] else 0
+        if size + item_size > DISCORD_MAX_EMBED_CHARS:
+            _discord_overflow = item
+            break
+        batch.append(item)
+        size += item_size
+    
+    return batch
+
+
+def _post_discord(payload: dict):
+    """POST a webhook payload, waiting out rate limits and backing off on server errors."""
+    # Compact separators and raw UTF-8 keep the emoji-heavy body small
+    data = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
     
-    Your upload request has been received and is pending review.
+    for attempt in range(DISCORD_MAX_ATTEMPTS):
+        try:
+            response = _session.post(
+                Config.DISCORD_WEBHOOK_URL,
+                data=data,
+                headers=_DISCORD_HEADERS,
+                timeout=DISCORD_TIMEOUT
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == DISCORD_MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(DISCORD_BACKOFF_BASE * 2 ** attempt)
+            continue
+        
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.json().get('retry_after', 1))
+            except ValueError:
+                retry_after = float(response.headers.get('Retry-After', 1))
+            time.sleep(retry_after)
+            continue
+        
+        if response.status_code >= 500 and attempt < DISCORD_MAX_ATTEMPTS - 1:
+            time.sleep(DISCORD_BACKOFF_BASE * 2 ** attempt)
+            continue
+        
+        response.raise_for_status()
+        print(f"Discord notification sent: {response.status_code}")
+        
+        # Bucket exhausted: hold off until it resets
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            time.sleep(float(response.headers.get('X-RateLimit-Reset-After', 1)))
+        return
     
-    File: {filename}
-    Type: {media_type_display}
+    raise requests.HTTPError(f"Still rate limited after {DISCORD_MAX_ATTEMPTS} attempts")
+
+
+def _discord_payload(batch: list) -> dict:
+    """Combine queued (message, embed) pairs into one webhook payload."""
+    payload = {"content": "\n".join(message for message, _ in batch if message)}
+    embeds = [embed for _, embed in batch if embed]
+    if embeds:
+        payload["embeds"] = embeds
+    return payload
+
+
+def _run_discord_worker():
+    """Deliver queued Discord notifications, up to DISCORD_MAX_EMBEDS per request."""
+    while True:
+        batch = _next_discord_batch()
+        
+        try:
+            _post_discord(_discord_payload(batch))
+        except requests.HTTPError as e:
+            # Discord rejected the payload outright: resend one at a time so a
+            # single malformed embed doesn't take the rest of the batch with it
+            status = e.response.status_code if e.response is not None else None
+            if len(batch) > 1 and status is not None and 400 <= status < 500:
+                for item in batch:
+                    time.sleep(DISCORD_MIN_INTERVAL)
+                    try:
+                        _post_discord(_discord_payload([item]))
+                    except Exception as item_error:
+                        print(f"Failed to send Discord notification: {item_error}")
+            else:
+                print(f"Failed to send Discord notification: {e}")
+        except Exception as e:
+            print(f"Failed to send Discord notification: {e}")
+        
+        time.sleep(DISCORD_MIN_INTERVAL)
+
+
+def dedupe(ttl: float):
+    """Decorator that skips repeat calls with identical arguments made within ttl seconds."""
+    def decorator(func):
+        sent = {}
+        lock = threading.Lock()
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            
+            with lock:
+                for stale in [k for k, sent_at in sent.items() if now - sent_at >= ttl]:
+                    del sent[stale]
+                if key in sent:
+                    print(f"Skipping duplicate {func.__name__}")
+                    return None
+                sent[key] = now
+            
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                # Let a retry of a failed send go through
+                with lock:
+                    sent.pop(key, None)
+                raise
+        
+        return wrapper
+    return decorator
+
+
+@dedupe(ttl=NOTIFICATION_DEDUPE_TTL)
+def send_upload_notification(uploader_email: str, filename: str, media_type: str, upload_id: str):
+    """Send notifications when a new upload is received."""
+    
+    media_type_display = "Movie" if media_type == "movie" else "TV Show"
     
-    You'll receive another email once your upload has been approved or denied.
+    html_body = _UPLOAD_USER_HTML.substitute(
+        app_name=_e(Config.APP_NAME), filename=_e(filename), media_type_display=media_type_display
+    )
     
-    Thanks for your contribution!
+    text_body = _UPLOAD_USER_TEXT.substitute(
+        app_name=Config.APP_NAME, filename=filename, media_type_display=media_type_display
+    )
     
-    — {Config.APP_NAME}
-    """
+    admin_html = _UPLOAD_ADMIN_HTML.substitute(
+        app_name=_e(Config.APP_NAME), app_url=_e(Config.APP_URL), filename=_e(filename),
+        uploader_email=_e(uploader_email), media_type_display=media_type_display
+    )
     
-    try:
-        send_email(
+    # The uploader and admin emails use separate SMTP sessions, so send them in parallel
+    email_futures = {
+        _executor.submit(
+            send_email,
             to_email=uploader_email,
             subject=f"Upload Request Received - {Config.APP_NAME}",
             html_body=html_body,
             text_body=text_body
-        )
-    except Exception as e:
-        print(f"Failed to send upload email to user: {e}")
-    
-    admin_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #FFD166 0%, #E8B33D 100%); color: #333; padding: 30px; border-radius: 10px 10px 0 0; text-align: center; }}
-            .header h1 {{ margin: 0; font-size: 24px; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .btn {{ display: inline-block; background: #5DCDCD; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; font-weight: bold; margin-top: 15px; }}
-            .footer {{ text-align: center; margin-top: 20px; color: #888; font-size: 12px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>📬 New Upload Pending Review</h1>
-            </div>
-            <div class="content">
-                <h2>New {media_type_display} Upload</h2>
-                <p><strong>File:</strong> {filename}</p>
-                <p><strong>Uploader:</strong> {uploader_email}</p>
-                <p><strong>Type:</strong> {media_type_display}</p>
-                <a href="{Config.APP_URL}/admin" class="btn">Review Upload</a>
-            </div>
-            <div class="footer">
-                <p>— {Config.APP_NAME} Admin</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    for admin_email in Config.ADMIN_EMAILS:
-        try:
-            send_email(
-                to_email=admin_email,
-                subject=f"🎬 New Upload Pending - {filename}",
-                html_body=admin_html
-            )
-        except Exception as e:
-            print(f"Failed to send admin email: {e}")
+        ): "Failed to send upload email to user",
+        _executor.submit(
+            send_bulk_email,
+            to_emails=Config.ADMIN_EMAILS,
+            subject=f"🎬 New Upload Pending - {filename}",
+            html_body=admin_html
+        ): "Failed to send admin email",
+    }
     
     if Config.DISCORD_ENABLED:
-        emoji = "🎬" if media_type == "movie" else "📺"
+        template = _UPLOAD_MOVIE_EMBED if media_type == "movie" else _UPLOAD_TV_EMBED
         embed = {
-            "title": f"{emoji} New Upload - {Config.APP_NAME}",
-            "color": 6147277,
+            **template,
             "fields": [
-                {"name": "📁 File", "value": filename, "inline": False},
-                {"name": "📂 Type", "value": media_type_display, "inline": True},
-                {"name": "👤 Uploader", "value": uploader_email, "inline": True}
-            ],
-            "footer": {"text": f"Review at {Config.APP_URL}/admin"}
+                _discord_field("📁 File", filename),
+                _discord_field("📂 Type", media_type_display, inline=True),
+                _discord_field("👤 Uploader", uploader_email, inline=True)
+            ]
         }
         
         try:
             send_discord_notification("", embed=embed)
         except Exception as e:
             print(f"Failed to send Discord notification: {e}")
+    
+    for future in as_completed(email_futures):
+        try:
+            future.result()
+        except Exception as e:
+            print(f"{email_futures[future]}: {e}")
 
 
+@dedupe(ttl=NOTIFICATION_DEDUPE_TTL)
 def send_approval_notification(uploader_email: str, filename: str, media_type: str):
     """Send notification when upload is approved."""
     
     media_type_display = "Movie" if media_type == "movie" else "TV Show"
     
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #4CAF50 0%, #388E3C 100%); color: white; padding: 30px; border-radius: 10px 10px 0 0; text-align: center; }}
-            .header h1 {{ margin: 0; font-size: 24px; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .success-badge {{ background: #4CAF50; color: white; padding: 8px 16px; border-radius: 20px; font-weight: bold; display: inline-block; }}
-            .footer {{ text-align: center; margin-top: 20px; color: #888; font-size: 12px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>✅ {Config.APP_NAME}</h1>
-            </div>
-            <div class="content">
-                <h2><span class="success-badge">APPROVED</span></h2>
-                <p>Great news! Your upload has been approved and added to Plex.</p>
-                <p><strong>File:</strong> {filename}</p>
-                <p><strong>Type:</strong> {media_type_display}</p>
-                <p>It should appear in your Plex library shortly.</p>
-                <p>Thanks for your contribution! 🎉</p>
-            </div>
-            <div class="footer">
-                <p>— {Config.APP_NAME}</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    text_body = f"""
-    {Config.APP_NAME} - Upload Approved!
-    
-    Great news! Your upload has been approved and added to Plex.
-    
-    File: {filename}
-    Type: {media_type_display}
-    
-    It should appear in your Plex library shortly.
-    
-    Thanks for your contribution!
+    html_body = _APPROVAL_HTML.substitute(
+        app_name=_e(Config.APP_NAME), filename=_e(filename), media_type_display=media_type_display
+    )
     
-    — {Config.APP_NAME}
-    """
+    text_body = _APPROVAL_TEXT.substitute(
+        app_name=Config.APP_NAME, filename=filename, media_type_display=media_type_display
+    )
     
     send_email(
         to_email=uploader_email,
@@ -269,11 +674,10 @@ def send_approval_notification(uploader_email: str, filename: str, media_type: s
     
     if Config.DISCORD_ENABLED:
         embed = {
-            "title": f"✅ Upload Approved",
-            "color": 5025616,
+            **_APPROVAL_EMBED,
             "fields": [
-                {"name": "📁 File", "value": filename, "inline": False},
-                {"name": "📂 Added to", "value": f"Plex {media_type_display}s Library", "inline": True}
+                _discord_field("📁 File", filename),
+                _discord_field("📂 Added to", f"Plex {media_type_display}s Library", inline=True)
             ]
         }
         
@@ -283,57 +687,20 @@ def send_approval_notification(uploader_email: str, filename: str, media_type: s
             print(f"Failed to send Discord notification: {e}")
 
 
+@dedupe(ttl=NOTIFICATION_DEDUPE_TTL)
 def send_denial_notification(uploader_email: str, filename: str, notes: str = ""):
     """Send notification when upload is denied."""
     
-    notes_section = f"<p><strong>Notes:</strong> {notes}</p>" if notes else ""
+    notes_section = f"<p><strong>Notes:</strong> {_e(notes)}</p>" if notes else ""
     notes_text = f"\nNotes: {notes}" if notes else ""
     
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #E83D5F 0%, #C42848 100%); color: white; padding: 30px; border-radius: 10px 10px 0 0; text-align: center; }}
-            .header h1 {{ margin: 0; font-size: 24px; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .denied-badge {{ background: #E83D5F; color: white; padding: 8px 16px; border-radius: 20px; font-weight: bold; display: inline-block; }}
-            .footer {{ text-align: center; margin-top: 20px; color: #888; font-size: 12px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>❌ {Config.APP_NAME}</h1>
-            </div>
-            <div class="content">
-                <h2><span class="denied-badge">NOT APPROVED</span></h2>
-                <p>Unfortunately, your upload was not approved.</p>
-                <p><strong>File:</strong> {filename}</p>
-                {notes_section}
-                <p>Please contact the admin if you have questions.</p>
-            </div>
-            <div class="footer">
-                <p>— {Config.APP_NAME}</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    text_body = f"""
-    {Config.APP_NAME} - Upload Not Approved
-    
-    Unfortunately, your upload was not approved.
-    
-    File: {filename}{notes_text}
-    
-    Please contact the admin if you have questions.
+    html_body = _DENIAL_HTML.substitute(
+        app_name=_e(Config.APP_NAME), filename=_e(filename), notes_section=notes_section
+    )
     
-    — {Config.APP_NAME}
-    """
+    text_body = _DENIAL_TEXT.substitute(
+        app_name=Config.APP_NAME, filename=filename, notes_text=notes_text
+    )
     
     send_email(
         to_email=uploader_email,
@@ -344,14 +711,13 @@ def send_denial_notification(uploader_email: str, filename: str, notes: str = ""
     
     if Config.DISCORD_ENABLED:
         embed = {
-            "title": f"❌ Upload Denied",
-            "color": 15220031,
+            **_DENIAL_EMBED,
             "fields": [
-                {"name": "📁 File", "value": filename, "inline": False}
+                _discord_field("📁 File", filename)
             ]
         }
         if notes:
-            embed["fields"].append({"name": "📝 Notes", "value": notes, "inline": False})
+            embed["fields"].append(_discord_field("📝 Notes", notes))
         
         try:
             send_discord_notification("", embed=embed)
@@ -3,34 +3,97 @@ Plex integration module for Bozloader.
 Handles triggering library scans after file approval.
 """
 
-import urllib.request
-import urllib.error
+import io
+import threading
+import time
 import xml.etree.ElementTree as ET
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
 
 from config import Config
 
 
+# Shared keep-alive session so repeated calls reuse the connection (and TLS
+# session) to Plex; the hostname is only resolved when a new connection is
+# opened. Only one host is ever contacted, so the pool stays small.
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+# Plex endpoints; the token travels in a header so URLs stay constant
+_ROOT_URL = f"{Config.PLEX_URL}/"
+_SECTIONS_URL = f"{Config.PLEX_URL}/library/sections"
+_HEADERS = {"X-Plex-Token": Config.PLEX_TOKEN, "Accept": "application/json"}
+
+# Library title -> (section key, time fetched); sections almost never change
+SECTION_CACHE_TTL = 3600
+_section_cache = {}
+
+# Server info and library listings are reused for this many seconds
+PLEX_INFO_CACHE_TTL = 30
+
+# Scan requests for the same library within this many seconds share one scan
+PLEX_SCAN_DEBOUNCE = 10
+_scan_timers = {}
+_scan_timers_lock = threading.Lock()
+
+
+def _media_container(response: requests.Response) -> dict:
+    """Return the MediaContainer of a Plex response as a dict.
+    
+    JSON is requested, but older servers may still answer with XML; that is
+    mapped onto the same shape (container attributes plus a Directory list).
+    """
+    if 'json' in response.headers.get('Content-Type', ''):
+        return response.json().get('MediaContainer', {})
+    
+    # iterparse lets each Directory be dropped once read instead of keeping the tree
+    container = {'Directory': []}
+    for event, elem in ET.iterparse(io.BytesIO(response.content), events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'MediaContainer':
+                container.update(elem.attrib)
+        elif elem.tag == 'Directory':
+            container['Directory'].append(dict(elem.attrib))
+            elem.clear()
+    return container
+
+
+def invalidate_section_cache():
+    """Forget cached library section IDs so the next lookup refetches them."""
+    _section_cache.clear()
+    _get_libraries.cache_clear()
+
+
 def get_library_section_id(library_name: str) -> str:
     """Get the Plex library section ID by name."""
     if not Config.PLEX_ENABLED:
         return None
     
-    url = f"{Config.PLEX_URL}/library/sections?X-Plex-Token={Config.PLEX_TOKEN}"
+    cached = _section_cache.get(library_name)
+    if cached and time.monotonic() - cached[1] < SECTION_CACHE_TTL:
+        return cached[0]
     
     try:
-        req = urllib.request.Request(url)
-        with urllib.request.urlopen(req, timeout=10) as response:
-            data = response.read()
-            root = ET.fromstring(data)
-            
-            for directory in root.findall('.//Directory'):
-                if directory.get('title') == library_name:
-                    return directory.get('key')
-            
-            print(f"Library '{library_name}' not found in Plex")
-            return None
+        response = _session.get(_SECTIONS_URL, headers=_HEADERS, timeout=10)
+        response.raise_for_status()
+        
+        # Cache every library at once so the other one is warm too
+        fetched_at = time.monotonic()
+        for directory in _media_container(response).get('Directory', []):
+            _section_cache[directory.get('title')] = (directory.get('key'), fetched_at)
+        
+        cached = _section_cache.get(library_name)
+        if cached:
+            return cached[0]
+        
+        print(f"Library '{library_name}' not found in Plex")
+        return None
             
-    except urllib.error.HTTPError as e:
+    except requests.HTTPError as e:
         print(f"Failed to get Plex libraries: {e}")
         return None
     except Exception as e:
@@ -50,15 +113,56 @@ def trigger_plex_scan(library_name: str) -> bool:
         print(f"Could not find library section for '{library_name}'")
         return False
     
-    url = f"{Config.PLEX_URL}/library/sections/{section_id}/refresh?X-Plex-Token={Config.PLEX_TOKEN}"
+    return trigger_plex_scan_by_id(section_id)
+
+
+def queue_plex_scan(library_name: str, section_id: str = None):
+    """Schedule a library scan, coalescing requests made within PLEX_SCAN_DEBOUNCE seconds.
+    
+    The scan runs once the window closes, so it picks up every file approved
+    during it. A known section_id skips the lookup by library name.
+    """
+    if not Config.PLEX_ENABLED:
+        print("Plex integration not configured - skipping scan")
+        return
+    
+    key = section_id or library_name
+    with _scan_timers_lock:
+        if key in _scan_timers:
+            return
+        timer = threading.Timer(PLEX_SCAN_DEBOUNCE, _run_queued_scan, args=(key, library_name, section_id))
+        timer.daemon = True
+        _scan_timers[key] = timer
+    timer.start()
+
+
+def _run_queued_scan(key: str, library_name: str, section_id: str):
+    with _scan_timers_lock:
+        _scan_timers.pop(key, None)
+    
+    if section_id:
+        trigger_plex_scan_by_id(section_id)
+    else:
+        trigger_plex_scan(library_name)
+
+
+def trigger_plex_scan_by_id(section_id: str) -> bool:
+    """Trigger a Plex library scan for a known section ID."""
+    if not Config.PLEX_ENABLED:
+        print("Plex integration not configured - skipping scan")
+        return False
+    
+    url = f"{_SECTIONS_URL}/{section_id}/refresh"
     
     try:
-        req = urllib.request.Request(url, method='GET')
-        with urllib.request.urlopen(req, timeout=10) as response:
-            print(f"Plex library scan triggered for '{library_name}' (section {section_id})")
-            return True
+        response = _session.get(url, headers=_HEADERS, timeout=10)
+        response.raise_for_status()
+        print(f"Plex library scan triggered for section {section_id}")
+        return True
             
-    except urllib.error.HTTPError as e:
+    except requests.HTTPError as e:
+        # The section may have been recreated under a new ID
+        invalidate_section_cache()
         print(f"Failed to trigger Plex scan: {e}")
         return False
     except Exception as e:
@@ -68,53 +172,60 @@ def trigger_plex_scan(library_name: str) -> bool:
 
 def test_plex_connection() -> dict:
     """Test Plex server connection and return server info."""
+    return _test_plex_connection(int(time.time() // PLEX_INFO_CACHE_TTL))
+
+
+@lru_cache(maxsize=1)
+def _test_plex_connection(_bucket: int) -> dict:
     if not Config.PLEX_ENABLED:
         return {"status": "disabled", "message": "Plex integration not configured"}
     
-    url = f"{Config.PLEX_URL}?X-Plex-Token={Config.PLEX_TOKEN}"
-    
     try:
-        req = urllib.request.Request(url)
-        with urllib.request.urlopen(req, timeout=10) as response:
-            data = response.read()
-            root = ET.fromstring(data)
-            
-            return {
-                "status": "connected",
-                "server_name": root.get('friendlyName', 'Unknown'),
-                "version": root.get('version', 'Unknown'),
-                "platform": root.get('platform', 'Unknown')
-            }
+        response = _session.get(_ROOT_URL, headers=_HEADERS, timeout=10)
+        response.raise_for_status()
+        container = _media_container(response)
+        
+        return {
+            "status": "connected",
+            "server_name": container.get('friendlyName', 'Unknown'),
+            "version": container.get('version', 'Unknown'),
+            "platform": container.get('platform', 'Unknown')
+        }
             
-    except urllib.error.HTTPError as e:
-        return {"status": "error", "message": f"HTTP Error: {e.code}"}
+    except requests.HTTPError as e:
+        return {"status": "error", "message": f"HTTP Error: {e.response.status_code}"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
 def get_libraries() -> list:
     """Get list of all Plex libraries."""
+    return _get_libraries(int(time.time() // PLEX_INFO_CACHE_TTL))
+
+
+@lru_cache(maxsize=1)
+def _get_libraries(_bucket: int) -> list:
     if not Config.PLEX_ENABLED:
         return []
     
-    url = f"{Config.PLEX_URL}/library/sections?X-Plex-Token={Config.PLEX_TOKEN}"
-    
     try:
-        req = urllib.request.Request(url)
-        with urllib.request.urlopen(req, timeout=10) as response:
-            data = response.read()
-            root = ET.fromstring(data)
-            
-            libraries = []
-            for directory in root.findall('.//Directory'):
-                libraries.append({
-                    "key": directory.get('key'),
-                    "title": directory.get('title'),
-                    "type": directory.get('type')
-                })
-            
-            return libraries
+        response = _session.get(_SECTIONS_URL, headers=_HEADERS, timeout=10)
+        response.raise_for_status()
+        libraries = []
+        for directory in _media_container(response).get('Directory', []):
+            libraries.append({
+                "key": directory.get('key'),
+                "title": directory.get('title'),
+                "type": directory.get('type')
+            })
+        
+        return libraries
             
     except Exception as e:
         print(f"Error getting Plex libraries: {e}")
         return []
+
+
+# Let callers force a fresh fetch, e.g. right after changing Plex settings
+test_plex_connection.cache_clear = _test_plex_connection.cache_clear
+get_libraries.cache_clear = _get_libraries.cache_clear
@@ -4,11 +4,16 @@ Custom web application for friends to upload movies/TV shows to a Plex server.
 """
 
 import os
+import json
 import shutil
+import smtplib
 import sqlite3
 import hashlib
 import secrets
+import urllib.request
 from datetime import datetime
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
 from functools import wraps
 from pathlib import Path
 from flask import (
@@ -156,10 +161,6 @@ def send_email(to_email, subject, body):
         return
     
     try:
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        
         msg = MIMEMultipart()
         msg['From'] = Config.SMTP_USER
         msg['To'] = to_email
@@ -181,9 +182,6 @@ def send_discord_notification(message):
         return
     
     try:
-        import urllib.request
-        import json
-        
         data = json.dumps({'content': message}).encode('utf-8')
         req = urllib.request.Request(
             Config.DISCORD_WEBHOOK,
@@ -202,8 +200,6 @@ def trigger_plex_scan():
         return
     
     try:
-        import urllib.request
-        
         url = f"{Config.PLEX_URL}/library/sections/all/refresh?X-Plex-Token={Config.PLEX_TOKEN}"
         req = urllib.request.Request(url, method='GET')
         urllib.request.urlopen(req)